@@ -3,6 +3,9 @@ from video_editor.utils import get_default_arg_parser, chose_file_path, chose_di
 from video_editor import Editor
 from argparse import Namespace
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import os
 
 def single_mode(args: Namespace):
     if args.video_file_path is None:
@@ -15,34 +18,78 @@ def single_mode(args: Namespace):
         fps=args.fps,
         without_audio=args.without_audio,
         write_threads=args.write_threads,
+        read_threads=args.read_threads,
+        hardware_encoding=not args.no_hardware_encoding,
+        stream_copy=not args.no_stream_copy,
         debug=args.debug,
         log_file_path=args.log_file
     )
     editor.load_video(video_file_path)
-    _, _, rotation = get_average_faces_position_in_clip(video_file_path)
+    _, _, rotation = get_average_faces_position_in_clip(video_file_path, editor.get_metadata())
     if rotation != 0:
         editor.rotate(rotation)
     editor.write_video(args.output_file_path)
 
+# Editor of the current worker process, created once by init_worker and reused for all the videos the worker processes.
+worker_editor: Editor = None
+
+# Number of threads the current worker process uses for the face search, its share of the CPU cores.
+# The face search runs before decoding and encoding start, so the worker's whole share is available to it.
+worker_threads: int = None
+
+def init_worker(args: Namespace, log_file_path: Path, write_threads: int, read_threads: int, hardware_encoding: bool):
+    global worker_editor, worker_threads
+    worker_threads = write_threads + read_threads
+    cv2.setNumThreads(worker_threads)
+    worker_editor = Editor(
+        output_format=args.output_format,
+        fps=args.fps,
+        without_audio=args.without_audio,
+        write_threads=write_threads,
+        read_threads=read_threads,
+        hardware_encoding=hardware_encoding,
+        stream_copy=not args.no_stream_copy,
+        log_file_path=log_file_path,
+        debug=args.debug)
+
+def process_video(args: Namespace, video_path: Path):
+    worker_editor.load_video(video_path)
+    _, _, rotation = get_average_faces_position_in_clip(video_path, worker_editor.get_metadata(), worker_threads)
+    if rotation != 0:
+        worker_editor.rotate(rotation)
+    worker_editor.write_video()
+
 def batch_mode(args: Namespace):
     if args.batch is True:
         dir_path: Path = chose_dir_path("Select a directory", "Directory Selector")
     else:
         dir_path = Path(args.batch)
-    editor = Editor(
-        output_format=args.output_format,
-        fps=args.fps,
-        without_audio=args.without_audio,
-        write_threads=args.write_threads,
-        log_file_path=dir_path / 'events.log' if args.log_file is None else args.log_file,
-        debug=args.debug)
-    for video_path in dir_path.iterdir():
-        if video_path.is_file() and f"*{video_path.suffix.upper()}" in Editor.supported_video_formats:
-            editor.load_video(video_path)
-            _, _, rotation = get_average_faces_position_in_clip(video_path)
-            if rotation != 0:
-                editor.rotate(rotation)
-            editor.write_video()
+    videos: list = [video_path for video_path in dir_path.iterdir()
+                    if video_path.is_file() and video_path.suffix.upper() in Editor.supported_video_extensions]
+    # Each video is processed in its own process. While a video is written, its FFmpeg decoding and encoding processes
+    # run at the same time, so each worker uses about read_threads + write_threads threads; the pool size keeps the total
+    # close to the CPU count.
+    write_threads: int = 2 if args.write_threads is None else args.write_threads
+    read_threads: int = write_threads if args.read_threads is None else args.read_threads
+    workers: int = max(1, os.cpu_count() // (write_threads + read_threads))
+    # Consumer GPUs limit the number of concurrent hardware encoding sessions, so hardware encoding is used only
+    # if a single worker writes the videos.
+    hardware_encoding: bool = not args.no_hardware_encoding and workers == 1
+    log_file_path: Path = dir_path / 'events.log' if args.log_file is None else args.log_file
+    failed: list = []
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=init_worker,
+                             initargs=(args, log_file_path, write_threads, read_threads, hardware_encoding)) as executor:
+        futures = {executor.submit(process_video, args, video_path): video_path
+                   for video_path in videos}
+        for future, video_path in futures.items():
+            try:
+                future.result()
+            except Exception as error:
+                print(f"Failed to process {video_path}: {error}")
+                failed.append(video_path)
+    if failed:
+        raise SystemExit(f"{len(failed)} of {len(futures)} videos failed")
 
 if __name__ == "__main__":
     parser = get_default_arg_parser()
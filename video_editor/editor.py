@@ -1,7 +1,10 @@
-from .utils import suppress_stdout, get_video_metadata, require_initialized, get_reasonable_thread_count
+from .metadata import Metadata
+from .utils import suppress_stdout, get_video_metadata, require_initialized, get_reasonable_thread_count, get_h264_encoder
+from .reader import ThreadedVideoFileClip
+from .writer import write_video_pipelined, copy_video_streams
 from pathlib import Path
-from moviepy import VideoFileClip, VideoClip, ImageClip, concatenate_videoclips
-from typing import Union
+from moviepy import VideoClip, ImageClip, concatenate_videoclips
+from typing import Union, Tuple, List, Optional
 import logging
 
 class Editor:
@@ -12,20 +15,41 @@ class Editor:
     supported_video_formats: tuple = ("*.MOV", "*.MP4", "*.MKV", "*.AVI")
     """Supported video file formats."""
 
+    supported_video_extensions: frozenset = frozenset(video_format[1:] for video_format in supported_video_formats)
+    """Upper-case extensions (with the leading dot) of the supported video file formats, for membership checks."""
+
     supported_img_formats: tuple = ("*.jpg", "*.png")
     """Supported image file formats."""
 
+    __h264_formats: tuple = ("mp4", "mkv", "mov")
+    """Output formats written with the H.264 encoder selected at initialization."""
+
+    __software_h264_encoder: Tuple[str, str, List[str]] = ("libx264", "veryfast", [])
+    """H.264 encoder used when a hardware encoder fails during encoding."""
+
+    __h264_codecs: tuple = ("h264", "avc1", "x264")
+    """Codec names of H.264 video streams, as reported in the video metadata."""
+
+    __edit_list_formats: tuple = ("mp4", "mov")
+    """Output formats whose edit lists hide the frames preceding a stream-copied cut."""
+
     video_file_path: Path = None
     """Path to the currently loaded video file."""
 
     __clip: VideoClip = None
     """The current video clip being edited."""
 
+    __metadata: Metadata = None
+    """Metadata of the currently loaded video file."""
+
     def __init__(self,
                  output_format: str = "mp4",
                  fps: int = None,
                  without_audio: bool = False,
                  write_threads: int = None,
+                 read_threads: int = None,
+                 hardware_encoding: bool = True,
+                 stream_copy: bool = True,
                  log_file_path: Union[Path, str, None] = None,
                  debug: bool = False) -> None:
         """
@@ -36,20 +60,34 @@ class Editor:
         :param without_audio: Whether to exclude audio from the video.
         :param write_threads: Number of threads to use for writing the video.
                           If not specified, it will be automatically determined based on the system's CPU count.
+        :param read_threads: Number of threads to use for decoding the loaded and inserted videos.
+                         If not specified, it will be automatically determined based on the system's CPU count.
+        :param hardware_encoding: Whether to encode H.264 video (mp4, mkv and mov formats) with a hardware encoder if one is available.
+                                  Without a working hardware encoder, libx264 with the "veryfast" preset is used.
+                                  If disabled, MoviePy's default encoding settings are used.
+        :param stream_copy: Whether to copy the H.264 video stream of a video that was only cut and/or rotated
+                            to an H.264 output format (mp4, mkv and mov) instead of re-encoding it.
         :param log_file_path: Path to the log file.
         :param debug: Whether to enable debug logging.
         """
         self.__setup_logger(log_file_path, debug)
+        self.__file_clips: List[ThreadedVideoFileClip] = []
         self.__output_format: str = output_format
         self.__fps: int = fps
         self.__audio: bool = not without_audio
         self.__write_threads: int = get_reasonable_thread_count() if write_threads is None else write_threads
+        self.__read_threads: int = get_reasonable_thread_count() if read_threads is None else read_threads
+        self.__stream_copy: bool = stream_copy
+        self.__h264_encoder: Tuple[str, str, List[str]] = get_h264_encoder() if hardware_encoding else ("libx264", "medium", [])
         self.logger.debug(
             f"Editor class initialized with:\n\t"
             f"output_format={output_format},\n\t"
             f"fps={fps},\n\t"
             f"without_audio={without_audio},\n\t"
             f"write_threads={'system-determined ' if write_threads is None else ''}{self.__write_threads},\n\t"
+            f"read_threads={'system-determined ' if read_threads is None else ''}{self.__read_threads},\n\t"
+            f"stream_copy={stream_copy},\n\t"
+            f"h264_encoder={self.__h264_encoder[0]} (preset {self.__h264_encoder[1]}),\n\t"
             f"log_file_path={log_file_path}"
         )
 
@@ -62,36 +100,76 @@ class Editor:
         """
         return self.__clip
 
+    @require_initialized("__metadata")
+    def get_metadata(self) -> Metadata:
+        """
+        Returns the metadata of the loaded video file, as probed when it was loaded.
+
+        :return: The Metadata object of the loaded video.
+        """
+        return self.__metadata
+
     def load_video(self, file_path: Path) -> None:
         """
         Loads a video file into the editor.
+        The video files opened for the previously loaded video are closed, so one editor can process several videos.
 
         :param file_path: Path to the video file to load.
         """
+        self.__close_file_clips()
+        metadata: Optional[Metadata] = get_video_metadata(file_path)
+        width, height = self.__get_normalized_video_size(metadata)
         with suppress_stdout():
-            self.__clip: VideoFileClip = VideoFileClip(str(file_path.absolute()), audio=self.__audio)
+            self.__clip: ThreadedVideoFileClip = ThreadedVideoFileClip(str(file_path.absolute()),
+                                                                       audio=self.__audio,
+                                                                       decode_threads=self.__read_threads,
+                                                                       target_resolution=(width, height))
+        self.__file_clips.append(self.__clip)
+        self.__metadata = metadata
         self.video_file_path: Path = file_path
+        self.__is_dirty: bool = False
+        self.__cut_range: Tuple[float, Optional[float]] = (0, None)
+        self.__rotation: int = 0
         self.logger.debug(f"Loaded video: {self.video_file_path}")
-        self.__normalize_video_size()
 
     @require_initialized("__clip")
     def write_video(self, output_file_path: Path = None, write_threads: int = None) -> Path:
         """
         Writes the edited video to a file.
 
+        If stream copy is enabled, the video was only cut and/or rotated and the output fps is not specified,
+        an H.264 video written to an H.264 output format has its encoded streams copied without re-encoding
+        (see copy_video_streams). Videos cut after their start are copied only to MP4 and MOV files,
+        since other containers would also play the frames from the keyframe preceding the cut.
+
         :param output_file_path: Path to save the output video. If None, a default path is used.
         :param write_threads: Number of threads to use for writing the video. If None, the value from class initialization is used.
         :return: The path to the saved video file.
         """
         if output_file_path is None:
             output_file_path: Path = Path(self.video_file_path.parent, f"{self.video_file_path.stem}-edited.{self.__output_format}")
+        codec: Optional[str] = None
+        preset: str = "medium"
+        ffmpeg_params: Optional[List[str]] = None
+        if output_file_path.suffix[1:].lower() in self.__h264_formats:
+            codec, preset, ffmpeg_params = self.__h264_encoder
         print(f"Writing video to {output_file_path}")
-        with suppress_stdout():
-            self.__clip.write_videofile(str(output_file_path.absolute()),
-                                        fps=self.__fps,
-                                        audio=self.__audio,
-                                        threads=self.__write_threads if write_threads is None else write_threads)
-            self.logger.info(f"Video written to {output_file_path}")
+        if self.__stream_copy and not self.__is_dirty and self.__fps is None and self.__copy_video(output_file_path):
+            self.logger.info(f"Video written to {output_file_path} without re-encoding")
+            return output_file_path
+        threads: int = self.__write_threads if write_threads is None else write_threads
+        try:
+            self.__encode_video(output_file_path, threads, codec, preset, ffmpeg_params)
+        except Exception as error:
+            if codec is None or codec == self.__software_h264_encoder[0]:
+                raise
+            # A hardware encoder that passed the probe can still fail on a real video (e.g. when the GPU's limit of
+            # concurrent encoding sessions is reached or the frame size is not supported), so fall back to libx264.
+            self.logger.warning(f"Encoding {output_file_path} with {codec} failed ({error}), retrying with libx264")
+            if output_file_path.exists():
+                output_file_path.unlink()
+            self.__encode_video(output_file_path, threads, *self.__software_h264_encoder)
+        self.logger.info(f"Video written to {output_file_path}")
         return output_file_path
 
     @require_initialized("__clip")
@@ -106,6 +184,12 @@ class Editor:
         if start_time < 0 or (end_time is not None and end_time < start_time):
             raise ValueError("Invalid start or end time for cutting the video.")
         self.__clip = self.__clip.subclipped(start_time, end_time)
+        # Keep the cut range relative to the loaded file, for copying its streams without re-encoding.
+        previous_start, previous_end = self.__cut_range
+        new_end: Optional[float] = None if end_time is None else previous_start + end_time
+        if previous_end is not None:
+            new_end = previous_end if new_end is None else min(new_end, previous_end)
+        self.__cut_range = (previous_start + start_time, new_end)
         self.logger.debug(f"Cut video from {start_time} to {end_time} seconds")
 
     @require_initialized("__clip")
@@ -118,7 +202,9 @@ class Editor:
         """
         if angle not in [0, 90, 180, 270]:
             raise ValueError("Invalid rotation angle. Must be one of [0, 90, 180, 270].")
-        self.__clip = self.__clip.rotated(angle)
+        # Without expand, MoviePy rotates the frames within the original size, cropping 90 and 270 degree rotations.
+        self.__clip = self.__clip.rotated(angle, expand=True)
+        self.__rotation = (self.__rotation + angle) % 360
         self.logger.debug(f"Rotated video by {angle} degrees")
 
     @require_initialized("__clip")
@@ -150,9 +236,11 @@ class Editor:
         :param method: Method for combining clips ("compose" or "chain").
         :raises ValueError: If cut_start_time or cut_end_time is invalid.
         """
-        video_clip: VideoClip = VideoFileClip(str(video_path.absolute()), audio=self.__audio)
-        if resize_video and (video_clip.size[0] != self.__clip.size[0] or video_clip.size[1] != self.__clip.size[1]):
-            video_clip = video_clip.resized((self.__clip.size[0], self.__clip.size[1]))
+        video_clip: VideoClip = ThreadedVideoFileClip(str(video_path.absolute()),
+                                                      audio=self.__audio,
+                                                      decode_threads=self.__read_threads,
+                                                      target_resolution=tuple(self.__clip.size) if resize_video else None)
+        self.__file_clips.append(video_clip)
         if cut_start_time < 0 or (cut_end_time is not None and cut_end_time < cut_start_time):
             raise ValueError("Invalid start or end time for cutting the video.")
         if cut_start_time > 0 or cut_end_time is not None:
@@ -170,6 +258,7 @@ class Editor:
         :param displayed_filepath: Path to display in logs for the inserted clip.
         """
         displayed_filepath = str(displayed_filepath.absolute()) if displayed_filepath else "clip"
+        self.__is_dirty = True
         time = self.__clip.duration + time if time < 0 else time
         if time == 0:
             self.__clip = concatenate_videoclips([clip, self.__clip], method=method)
@@ -193,12 +282,74 @@ class Editor:
         with suppress_stdout():
             return self.__clip.subclipped(start_time, end_time)
 
-    @require_initialized("__clip")
-    def __normalize_video_size(self) -> None:
+    def __encode_video(self,
+                       output_file_path: Path,
+                       threads: int,
+                       codec: Optional[str],
+                       preset: str,
+                       ffmpeg_params: Optional[List[str]]) -> None:
         """
-        Normalizes the video size based on its metadata, adjusting for rotation if necessary.
+        Renders and encodes the current clip to a file.
+
+        :param output_file_path: Path to save the output video.
+        :param threads: Number of threads for the FFmpeg encoder.
+        :param codec: Video codec. If None, it is determined by the output file extension.
+        :param preset: Encoder preset.
+        :param ffmpeg_params: Additional FFmpeg parameters.
+        """
+        with suppress_stdout():
+            write_video_pipelined(self.__clip,
+                                  output_file_path,
+                                  fps=self.__fps,
+                                  audio=self.__audio,
+                                  threads=threads,
+                                  codec=codec,
+                                  preset=preset,
+                                  ffmpeg_params=ffmpeg_params)
+
+    def __copy_video(self, output_file_path: Path) -> bool:
+        """
+        Writes the loaded video, cut and rotated as requested, by copying its encoded streams.
+        Rotations are stored as display rotation metadata.
+
+        :param output_file_path: Path to save the output video.
+        :return: True if the video was written, False if the streams couldn't be copied to the output file.
+        """
+        # Copying keeps the source codec, so it is done only if the output would be encoded with the same one.
+        if (output_file_path.suffix[1:].lower() not in self.__h264_formats
+                or self.__metadata.codec.lower() not in self.__h264_codecs):
+            self.logger.debug(f"The {self.__metadata.codec} stream can't be copied to {output_file_path}, re-encoding")
+            return False
+        start_time, end_time = self.__cut_range
+        if start_time > 0 and output_file_path.suffix[1:].lower() not in self.__edit_list_formats:
+            self.logger.debug(f"Cut can't be copied frame-accurately to {output_file_path}, re-encoding")
+            return False
+        rotation: Optional[int] = None
+        if self.__rotation != 0:
+            # The metadata rotation is clockwise, while both Editor.rotate and FFmpeg's display rotation are counterclockwise.
+            rotation = (360 - self.__metadata.rotation + self.__rotation) % 360
+        if copy_video_streams(self.video_file_path, output_file_path, start_time, end_time, rotation, self.__audio):
+            return True
+        self.logger.debug(f"Unable to copy the streams of {self.video_file_path} to {output_file_path}, re-encoding")
+        return False
+
+    def __close_file_clips(self) -> None:
+        """
+        Closes the readers of the video files opened by the editor (the loaded video and the inserted ones).
+        """
+        for file_clip in self.__file_clips:
+            file_clip.close()
+        self.__file_clips.clear()
+
+    def __get_normalized_video_size(self, metadata: Optional[Metadata]) -> Tuple[int, int]:
+        """
+        Determines the display size of a video based on its metadata, adjusting for rotation if necessary.
+        The size is applied by FFmpeg while decoding, so the frames don't have to be resized afterwards.
+
+        :param metadata: The metadata of the video file.
+        :return: The (width, height) of the video.
+        :raises ValueError: If the video metadata cannot be retrieved.
         """
-        metadata = get_video_metadata(self.__clip.filename)
         if metadata is None:
             raise ValueError("Unable to retrieve video metadata.")
         width = metadata.width
@@ -206,8 +357,8 @@ class Editor:
         rotation = metadata.rotation
         if rotation == 90 or rotation == 270:
             width, height = height, width
-        self.__clip = self.__clip.resized((width, height))
         self.logger.debug(f"Normalized video size to {width}x{height} with rotation {rotation}")
+        return width, height
 
     def __setup_logger(self, log_file_path: Union[Path, str, None], debug: bool) -> None:
         """
@@ -218,13 +369,22 @@ class Editor:
         """
         self.logger: logging.Logger = logging.getLogger("VideoEditor")
         self.logger.setLevel(logging.DEBUG if debug else logging.INFO)
-        self.logger.addHandler(logging.StreamHandler())
+        # The logger is shared by all Editor instances, so handlers are added only once to avoid duplicated log lines.
+        if not any(type(handler) is logging.StreamHandler for handler in self.logger.handlers):
+            self.logger.addHandler(logging.StreamHandler())
         if log_file_path is not None:
             if isinstance(log_file_path, str):
                 log_file_path = Path(log_file_path)
             if not log_file_path.parent.exists():
                 log_file_path.parent.mkdir(parents=True, exist_ok=True)
-            file_handler = logging.FileHandler(str(log_file_path.absolute()), mode="a")
-            file_handler.setLevel(logging.DEBUG if debug else logging.INFO)
-            file_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
-            self.logger.addHandler(file_handler)
\ No newline at end of file
+            log_file_path = log_file_path.resolve()
+            file_handler: Optional[logging.FileHandler] = next(
+                (handler for handler in self.logger.handlers
+                 if isinstance(handler, logging.FileHandler) and handler.baseFilename == str(log_file_path)),
+                None
+            )
+            if file_handler is None:
+                file_handler = logging.FileHandler(str(log_file_path), mode="a")
+                file_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+                self.logger.addHandler(file_handler)
+            file_handler.setLevel(logging.DEBUG if debug else logging.INFO)
\ No newline at end of file
@@ -1,13 +1,53 @@
 from cv2.data import haarcascades
 from pathlib import Path
 from numpy import ndarray
-from typing import Generator, Dict, Union, Tuple, Sequence, Optional
-from .utils import get_video_metadata
+from typing import Iterable, Iterator, Dict, Union, Tuple, Sequence, Optional
+from .utils import get_video_metadata, get_reasonable_thread_count
+from .metadata import Metadata
+import numpy as np
 import cv2
 
-# Initialize a face cascade classifier using a pre-trained Haar cascade model for frontal face detection.
+try:
+    from decord import VideoReader, cpu
+except ImportError:
+    VideoReader = None
+
+# Let OpenCV use its SIMD-optimized code paths. The number of threads used for color conversion, resizing and
+# face detection is set for each clip searched (see get_average_faces_position_in_clip).
+cv2.setUseOptimized(True)
+
+# Path to the YuNet face detection model. OpenCV doesn't ship the model, so it is used only if it has been downloaded
+# to this location; YuNet is faster and far more reliable than the Haar cascade on rotated and partly turned faces.
+__yunet_model_path: Path = Path(__file__).parent / "models" / "face_detection_yunet_2023mar.onnx"
+
+# Initialize the YuNet face detector if its model is available. The input size is set for every detected image.
+__face_detector: Optional[cv2.FaceDetectorYN] = (
+    cv2.FaceDetectorYN.create(str(__yunet_model_path), "", (320, 320)) if __yunet_model_path.exists() else None
+)
+
+# Initialize a face cascade classifier using a pre-trained Haar cascade model for frontal face detection,
+# used when the YuNet model is not available.
 __face_cascade: cv2.CascadeClassifier = cv2.CascadeClassifier(haarcascades + 'haarcascade_frontalface_default.xml')
 
+# Frames are downscaled so that their larger side does not exceed this size before running face detection.
+# Faces needed to estimate the orientation are large, so detecting them on full-resolution frames is wasted work.
+__detection_max_size: int = 640
+
+# Minimum face size (in pixels of the downscaled frame) reported by the Haar cascade.
+__detection_min_face_size: Tuple[int, int] = (40, 40)
+
+# Number of frames with faces found in the same rotation after which the clip orientation is considered known.
+__faces_per_rotation: int = 3
+
+# Sampled frames are compared as thumbnails of this size; if the mean absolute difference from the last searched frame
+# is below the threshold, the face search is skipped and its result reused.
+__difference_thumbnail_size: Tuple[int, int] = (32, 32)
+__difference_threshold: float = 3.0
+
+# Number of sampled frames decoded at once when decord is available. Kept small because sampling usually stops
+# after a few frames, once enough faces have been found.
+__decode_batch_size: int = 3
+
 # Dictionary mapping rotation angles to OpenCV rotation constants.
 __cv2_rotation_consts: dict = {
     90: cv2.ROTATE_90_COUNTERCLOCKWISE,
@@ -15,6 +55,9 @@ __cv2_rotation_consts: dict = {
     270: cv2.ROTATE_90_CLOCKWISE
 }
 
+# Buffers receiving rotated frames, keyed by frame shape and rotation angle, to avoid per-frame allocations.
+__rotation_buffers: Dict[Tuple[Tuple[int, ...], int], ndarray] = {}
+
 def __rotation_generator(current_rotate: int = 0):
     """
     Generator that yields rotation angles in a specific order starting from the given angle.
@@ -32,12 +75,21 @@ def __rotation_generator(current_rotate: int = 0):
     for i in range(len(rotates)):
         yield rotates[i]
 
-def get_average_faces_position_in_clip(path: Path) -> Tuple[int, int, int]:
+def get_average_faces_position_in_clip(path: Path,
+                                      metadata: Optional[Metadata] = None,
+                                      threads: Optional[int] = None) -> Tuple[int, int, int]:
     """
     Calculates the average position of detected faces in a video clip.
 
     Args:
         path (Path): Path to the video file.
+        metadata (Optional[Metadata]): Metadata of the video file, e.g. from Editor.get_metadata.
+            If None, the video file is probed.
+        threads (Optional[int]): Number of threads decord uses for decoding, and OpenCV for color conversion,
+            resizing and face detection during the search; the previous OpenCV setting is restored afterwards.
+            If None, it is determined based on the system's CPU count. The OpenCV setting has no effect if OpenCV
+            was built without a parallel backend (TBB, OpenMP or pthreads); the official opencv-python and
+            opencv-contrib-python wheels include one.
 
     Returns:
         Tuple[int, int, int]: A tuple containing the average x and y positions of faces
@@ -49,22 +101,35 @@ def get_average_faces_position_in_clip(path: Path) -> Tuple[int, int, int]:
         180: [],
         270: []
     }
-    capture: cv2.VideoCapture = cv2.VideoCapture(str(path.absolute()))
-    metadata = get_video_metadata(path)
+    if metadata is None:
+        metadata = get_video_metadata(path)
     rotation: int = 0
-    frames_counter: int = 1
-    while True:
-        captured, image = capture.read()
-        if not captured:
-            break
-        average_faces_position_in_frame: tuple = get_average_face_position_in_image(image, rotation)
-        if average_faces_position_in_frame is not None:
-            x, y, rotation = average_faces_position_in_frame
-            faces[rotation].append((x, y))
-            if len(faces[rotation]) > 2:
-                break
-        frames_counter += 1
-        capture.set(cv2.CAP_PROP_POS_FRAMES, metadata.fps * frames_counter)
+    last_thumbnail: Optional[ndarray] = None
+    average_faces_position_in_frame: Optional[Tuple[int, int, int]] = None
+    frame_h: int = 0
+    frame_w: int = 0
+    threads = get_reasonable_thread_count() if threads is None else threads
+    previous_threads: int = cv2.getNumThreads()
+    cv2.setNumThreads(threads)
+    try:
+        for image in __sample_frames(path, max(round(metadata.fps), 1), threads):
+            frame_h, frame_w = image.shape[:2]
+            image = __to_detector_format(image)
+            thumbnail: ndarray = cv2.resize(image, __difference_thumbnail_size, interpolation=cv2.INTER_AREA)
+            if thumbnail.ndim == 3:
+                thumbnail = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY)
+            thumbnail = thumbnail.astype(np.int16)
+            # Frames barely differing from the last one searched show the same scene, so the previous result is reused.
+            if last_thumbnail is None or np.mean(np.abs(thumbnail - last_thumbnail)) >= __difference_threshold:
+                average_faces_position_in_frame = get_average_face_position_in_image(image, rotation)
+                last_thumbnail = thumbnail
+            if average_faces_position_in_frame is not None:
+                x, y, rotation = average_faces_position_in_frame
+                faces[rotation].append((x, y))
+                if len(faces[rotation]) >= __faces_per_rotation:
+                    break
+    finally:
+        cv2.setNumThreads(previous_threads)
     max_faces_in_group: int = 0
     for key, faces_in_group in faces.items():
         count_faces_in_group: int = len(faces_in_group)
@@ -72,40 +137,69 @@ def get_average_faces_position_in_clip(path: Path) -> Tuple[int, int, int]:
             max_faces_in_group = count_faces_in_group
             rotation = key
     if rotation / 90 % 2 == 1:
-        clip_w: int = metadata.height
-        clip_h: int = metadata.width
+        clip_w: int = frame_h
+        clip_h: int = frame_w
     else:
-        clip_w: int = metadata.width
-        clip_h: int = metadata.height
-    lines: tuple = ((clip_w / 3, clip_w * 2 / 3, clip_w),
-                    (clip_h / 3, clip_h * 2 / 3, clip_h))
-    average_x: int = 0
-    average_y: int = 0
-    faces_counter: int = 0
-    for face in faces[rotation]:
-        fase: tuple
-        x: int = 0
-        y: int = 0
-        for i in range(0, len(lines[0])):
-            if face[0] <= lines[0][i]:
-                x = i + 1
-                break
-        for i in range(0, len(lines[1])):
-            if face[1] <= lines[1][i]:
-                y = i + 1
+        clip_w: int = frame_w
+        clip_h: int = frame_h
+    positions: ndarray = np.array(faces[rotation])
+    # Index of the grid column/row (1 to 3) each face falls into; faces on a grid line belong to the lower cell.
+    grid_x: ndarray = np.searchsorted((clip_w / 3, clip_w * 2 / 3), positions[:, 0]) + 1
+    grid_y: ndarray = np.searchsorted((clip_h / 3, clip_h * 2 / 3), positions[:, 1]) + 1
+    return round(grid_x.mean()), round(grid_y.mean()), rotation
+
+def __sample_frames(path: Path, frames_step: int, threads: int) -> Iterator[ndarray]:
+    """
+    Decodes every frames_step-th frame of a video, in display orientation.
+
+    Uses decord if it is installed: it decodes the sampled frames in batches with multiple threads and seeks
+    to them through keyframes. Otherwise, OpenCV grabs the frames in between without converting them.
+
+    Args:
+        path (Path): Path to the video file.
+        frames_step (int): Number of frames between two sampled frames.
+        threads (int): Number of decoding threads used by decord.
+
+    Yields:
+        ndarray: The next sampled frame in BGR format.
+    """
+    if VideoReader is not None:
+        reader: VideoReader = VideoReader(str(path.absolute()), ctx=cpu(0), num_threads=threads)
+        indices: range = range(0, len(reader), frames_step)
+        for i in range(0, len(indices), __decode_batch_size):
+            for frame in reader.get_batch(list(indices[i:i + __decode_batch_size])).asnumpy():
+                yield cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+        return
+    capture: cv2.VideoCapture = cv2.VideoCapture(str(path.absolute()))
+    capture.set(cv2.CAP_PROP_ORIENTATION_AUTO, 1)
+    try:
+        captured: bool = capture.grab()
+        while captured:
+            captured, image = capture.retrieve()
+            if not captured:
                 break
-        average_x += x
-        average_y += y
-        faces_counter += 1
-    return round(average_x / faces_counter), round(average_y / faces_counter), rotation
+            yield image
+            # Grab (demux and decode without conversion) up to the next sampled frame instead of seeking,
+            # which would force the decoder to restart from the nearest keyframe for every sample.
+            for _ in range(frames_step):
+                captured = capture.grab()
+                if not captured:
+                    break
+    finally:
+        capture.release()
 
-def get_average_face_position_in_image(image: ndarray, rotation: Union[int, Generator] = 0) -> Optional[Tuple[int, int, int]]:
+def get_average_face_position_in_image(image: ndarray, rotation: Union[int, Iterable[int]] = 0) -> Optional[Tuple[int, int, int]]:
     """
     Detects faces in an image and calculates the average position of the detected faces.
 
+    Images larger than the detection size are downscaled before detection; the positions are returned
+    in the coordinates of the original image.
+
     Args:
-        image (ndarray): The input image in which faces are to be detected.
-        rotation (Union[int, Generator]): The rotation angle or a generator of rotation angles.
+        image (ndarray): The input image in which faces are to be detected, either BGR or grayscale.
+            It is converted once to the format used by the face detector.
+        rotation (Union[int, Iterable[int]]): The rotation angle to try first, or the rotation angles to try in order.
+            The rotations are tried one by one until faces are found.
 
     Returns:
         Optional[Tuple[int, int, int]]: A tuple containing the average x and y positions of faces
@@ -113,26 +207,70 @@ def get_average_face_position_in_image(image: ndarray, rotation: Union[int, Gene
     """
     if type(rotation) == int:
         rotation = __rotation_generator(rotation)
-    average_x: int = 0
-    average_y: int = 0
-    try:
-        current_rotation: int = next(rotation)
-    except StopIteration:
-        return None
-    face_counter: int = 0
-    if current_rotation != 0:
-        r_image: ndarray = cv2.rotate(image, __cv2_rotation_consts[current_rotation])
-    else:
-        r_image: ndarray = image
-    gray: ndarray = cv2.cvtColor(r_image, cv2.COLOR_BGR2GRAY)
-    faces_in_frame: Sequence = __face_cascade.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=10)
-    if len(faces_in_frame) == 0:
-        return get_average_face_position_in_image(image, rotation)
-    for face in faces_in_frame:
-        face: tuple
-        x = face[0] + face[2] / 2
-        y = face[1] + face[3] / 2
-        average_x += x
-        average_y += y
-        face_counter += 1
-    return round(average_x / face_counter), round(average_y / face_counter), current_rotation
\ No newline at end of file
+    image = __to_detector_format(image)
+    scale: float = min(__detection_max_size / max(image.shape[:2]), 1.0)
+    if scale < 1.0:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    for current_rotation in rotation:
+        faces_in_frame: Sequence = __detect_faces(__rotate_image(image, current_rotation))
+        if len(faces_in_frame) == 0:
+            continue
+        faces: ndarray = np.asarray(faces_in_frame, dtype=np.float32)
+        # Centers (x + width / 2, y + height / 2) of all the faces, averaged in one pass.
+        average_center: ndarray = (faces[:, :2] + faces[:, 2:4] * 0.5).mean(axis=0) / scale
+        return round(float(average_center[0])), round(float(average_center[1])), current_rotation
+    return None
+
+def __to_detector_format(image: ndarray) -> ndarray:
+    """
+    Converts an image to the color format expected by the face detector: BGR for YuNet, grayscale for the Haar cascade.
+
+    Args:
+        image (ndarray): A BGR or grayscale image.
+
+    Returns:
+        ndarray: The converted image, or the input image itself if it is already in the expected format.
+    """
+    if __face_detector is None and image.ndim == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if __face_detector is not None and image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    return image
+
+def __detect_faces(image: ndarray) -> Sequence:
+    """
+    Detects faces in an image with YuNet if its model is available, or with the Haar cascade otherwise.
+
+    Args:
+        image (ndarray): The image in the face detector's format.
+
+    Returns:
+        Sequence: The bounding boxes (x, y, width, height) of the detected faces.
+    """
+    if __face_detector is None:
+        return __face_cascade.detectMultiScale(image, scaleFactor=1.2, minNeighbors=10, minSize=__detection_min_face_size)
+    __face_detector.setInputSize((image.shape[1], image.shape[0]))
+    _, faces = __face_detector.detect(image)
+    return () if faces is None else faces[:, :4]
+
+def __rotate_image(image: ndarray, rotation: int) -> ndarray:
+    """
+    Rotates an image into a buffer reused between calls with the same frame shape and angle.
+
+    Args:
+        image (ndarray): The image to rotate.
+        rotation (int): The rotation angle.
+
+    Returns:
+        ndarray: The rotated image, or the input image itself if the angle is 0.
+    """
+    if rotation == 0:
+        return image
+    key: Tuple[Tuple[int, ...], int] = (image.shape, rotation)
+    buffer: Optional[ndarray] = __rotation_buffers.get(key)
+    if buffer is None:
+        height, width = image.shape[:2]
+        rotated_size: Tuple[int, int] = (height, width) if rotation == 180 else (width, height)
+        buffer = np.empty(rotated_size + image.shape[2:], dtype=image.dtype)
+        __rotation_buffers[key] = buffer
+    return cv2.rotate(image, __cv2_rotation_consts[rotation], dst=buffer)
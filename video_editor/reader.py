@@ -0,0 +1,109 @@
+from moviepy import VideoFileClip, VideoClip, AudioFileClip
+from moviepy.config import FFMPEG_BINARY
+from moviepy.decorators import convert_path_to_string
+from moviepy.tools import cross_platform_popen_params, ffmpeg_escape_filename
+from moviepy.video.io.ffmpeg_reader import FFMPEG_VideoReader
+from typing import Optional, Tuple
+from .utils import get_reasonable_thread_count
+import subprocess as sp
+
+class ThreadedVideoReader(FFMPEG_VideoReader):
+    """
+    MoviePy video reader that lets the FFmpeg decoder use several threads.
+
+    MoviePy starts the decoding process without any threading options, so FFmpeg decodes frames
+    on a single core. This reader passes ``-threads`` and ``-thread_type frame+slice`` as input options.
+    """
+
+    def __init__(self, filename: str, decode_threads: Optional[int] = None, **kwargs) -> None:
+        """
+        Initializes the reader and starts the decoding process.
+
+        :param filename: Path to the video file.
+        :param decode_threads: Number of threads for the FFmpeg decoder.
+                               If not specified, it will be automatically determined based on the system's CPU count.
+        :param kwargs: Keyword arguments passed to FFMPEG_VideoReader.
+        """
+        self.decode_threads: int = get_reasonable_thread_count() if decode_threads is None else decode_threads
+        super().__init__(filename, **kwargs)
+
+    def initialize(self, start_time: float = 0) -> None:
+        """
+        Opens the file, creates the pipe.
+        Mirrors FFMPEG_VideoReader.initialize with the decoder threading options added.
+
+        :param start_time: Time in seconds from which to start decoding.
+        """
+        self.close(delete_lastread=False)
+        i_arg: list = ["-threads", str(self.decode_threads), "-thread_type", "frame+slice"]
+        if start_time != 0:
+            offset = min(1, start_time)
+            i_arg += [
+                "-ss", "%.06f" % (start_time - offset),
+                "-i", ffmpeg_escape_filename(self.filename),
+                "-ss", "%.06f" % offset
+            ]
+        else:
+            i_arg += ["-i", ffmpeg_escape_filename(self.filename)]
+        # FFmpeg's native webm decoders don't decode the alpha layer, so force libvpx for transparent videos.
+        if self.depth == 4:
+            codec_name = self.infos.get("video_codec_name")
+            if codec_name == "vp9":
+                i_arg = ["-c:v", "libvpx-vp9"] + i_arg
+            elif codec_name == "vp8":
+                i_arg = ["-c:v", "libvpx"] + i_arg
+        cmd: list = [FFMPEG_BINARY] + i_arg + [
+            "-loglevel", "error",
+            "-f", "image2pipe",
+            "-vf", "scale=%d:%d" % tuple(self.size),
+            "-sws_flags", self.resize_algo,
+            "-pix_fmt", self.pixel_format,
+            "-vcodec", "rawvideo",
+            "-"
+        ]
+        popen_params: dict = cross_platform_popen_params({
+            "bufsize": self.bufsize,
+            "stdout": sp.PIPE,
+            "stderr": sp.PIPE,
+            "stdin": sp.DEVNULL
+        })
+        self.proc = sp.Popen(cmd, **popen_params)
+        self.pos = self.get_frame_number(start_time)
+        self.last_read = self.read_frame()
+
+class ThreadedVideoFileClip(VideoFileClip):
+    """
+    VideoFileClip that decodes its frames with ThreadedVideoReader.
+    """
+
+    @convert_path_to_string("filename")
+    def __init__(self,
+                 filename: str,
+                 audio: bool = True,
+                 decode_threads: Optional[int] = None,
+                 target_resolution: Optional[Tuple[int, int]] = None) -> None:
+        """
+        Initializes the clip.
+
+        :param filename: Path to the video file.
+        :param audio: Whether to load the audio of the video.
+        :param decode_threads: Number of threads for the FFmpeg decoder.
+                               If not specified, it will be automatically determined based on the system's CPU count.
+        :param target_resolution: Size (width, height) to which FFmpeg scales the frames while decoding.
+        """
+        VideoClip.__init__(self)
+        self.reader: ThreadedVideoReader = ThreadedVideoReader(
+            filename,
+            decode_threads=decode_threads,
+            decode_file=False,
+            target_resolution=target_resolution
+        )
+        self.duration = self.reader.duration
+        self.end = self.reader.duration
+        self.fps = self.reader.fps
+        self.size = self.reader.size
+        self.rotation = self.reader.rotation
+        self.filename = filename
+        self.frame_function = lambda t: self.reader.get_frame(t)
+        if audio and self.reader.infos["audio_found"]:
+            self.audio = AudioFileClip(filename)
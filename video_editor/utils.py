@@ -1,11 +1,13 @@
-from typing import Optional, Iterable, Union
-from functools import wraps
+from typing import Optional, Iterable, Union, Tuple, List
+from functools import wraps, lru_cache
 from easygui import fileopenbox, diropenbox, msgbox
-from pymediainfo import MediaInfo
 from pathlib import Path
 from argparse import ArgumentParser
+from moviepy.config import FFMPEG_BINARY
 from .metadata import Metadata
+import subprocess
 import contextlib
+import cv2
 import sys
 import os
 
@@ -27,6 +29,9 @@ def get_default_arg_parser(prog: str = None, usage: str = None, description: str
     parser.add_argument("-f", "--fps", type=int, default=None, help="Frames per second for the output video")
     parser.add_argument("-of", "--output_format", type=str, default="mp4", help="Output video format (default: mp4)")
     parser.add_argument("-t", "--write_threads", type=int, default=None, help="Number of threads for writing video")
+    parser.add_argument("-rt", "--read_threads", type=int, default=None, help="Number of threads for decoding video")
+    parser.add_argument("-nh", "--no_hardware_encoding", action="store_true", help="Encode H.264 video on the CPU even if a hardware encoder is available")
+    parser.add_argument("-nc", "--no_stream_copy", action="store_true", help="Re-encode the output video even if its streams could be copied")
     parser.add_argument("-wa", "--without_audio", action="store_true", help="Remove audio from the output video")
     parser.add_argument("--debug", action="store_true", help="Enable debug mode")
     parser.add_argument("--log_file", type=Path, default=None, help="Path to the log file")
@@ -47,6 +52,47 @@ def get_reasonable_thread_count() -> int:
         return 2
     return total - 2
 
+def get_h264_encoder() -> Tuple[str, str, List[str]]:
+    """
+    Selects the fastest working H.264 encoder of the FFmpeg binary used by MoviePy.
+
+    Hardware encoders are tried in order of preference; each one is checked by encoding a test frame,
+    since FFmpeg builds list them even without a supported GPU or driver. Falls back to libx264 with
+    the "veryfast" preset. The result is cached for the lifetime of the process.
+
+    :return: A tuple of the encoder name, its preset and additional FFmpeg parameters.
+    """
+    return __select_h264_encoder()
+
+@lru_cache(maxsize=None)
+def __select_h264_encoder() -> Tuple[str, str, List[str]]:
+    """
+    Probes the hardware H.264 encoders and returns the first one that works.
+
+    :return: A tuple of the encoder name, its preset and additional FFmpeg parameters.
+    """
+    hardware_encoders: List[Tuple[str, str, List[str]]] = [
+        ("h264_nvenc", "p4", ["-tune", "hq", "-pix_fmt", "yuv420p"]),
+        ("h264_qsv", "veryfast", ["-pix_fmt", "nv12"]),
+        ("h264_videotoolbox", "medium", ["-pix_fmt", "yuv420p"]),
+        ("h264_amf", "speed", ["-pix_fmt", "yuv420p"])
+    ]
+    try:
+        encoders: str = subprocess.run([FFMPEG_BINARY, "-hide_banner", "-encoders"],
+                                       capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        encoders = ""
+    for codec, preset, ffmpeg_params in hardware_encoders:
+        if f" {codec} " not in encoders:
+            continue
+        probe = subprocess.run([FFMPEG_BINARY, "-hide_banner", "-loglevel", "error",
+                                "-f", "lavfi", "-i", "color=size=256x256:rate=1", "-frames:v", "1",
+                                "-vcodec", codec, "-preset", preset, *ffmpeg_params, "-f", "null", "-"],
+                               capture_output=True)
+        if probe.returncode == 0:
+            return codec, preset, ffmpeg_params
+    return "libx264", "veryfast", []
+
 def require_initialized(attr_name):
     """
     Decorator to ensure that a specified attribute is initialized before calling a method.
@@ -76,24 +122,42 @@ def get_video_metadata(path: Union[Path, str]) -> Optional[Metadata]:
     """
     Retrieves metadata for a video file.
 
+    Results are cached per file path and modification time, so repeated calls for the same file don't probe it again.
+
     :param path: The path to the video file.
     :return: A Metadata object containing video details, or None if no video track is found.
     """
     if isinstance(path, str):
         path = Path(path)
-    media_info = MediaInfo.parse(path)
-    for track in media_info.tracks:
-        if track.track_type == "Video":
-            return Metadata(
-                filename=path.name,
-                width=track.width,
-                height=track.height,
-                rotation=float(track.rotation) if track.rotation else 0,
-                duration=track.duration,
-                codec=track.codec,
-                fps=track.frame_rate
-            )
-    return None
+    path = path.absolute()
+    return __probe_video_metadata(str(path), path.stat().st_mtime_ns)
+
+@lru_cache(maxsize=128)
+def __probe_video_metadata(path: str, mtime_ns: int) -> Optional[Metadata]:
+    """
+    Probes a video file with OpenCV's FFmpeg backend.
+
+    :param path: The absolute path to the video file.
+    :param mtime_ns: The modification time of the file, used to invalidate cached results.
+    :return: A Metadata object containing video details, or None if no video track is found.
+    """
+    capture: cv2.VideoCapture = cv2.VideoCapture(path)
+    try:
+        if not capture.isOpened() or capture.get(cv2.CAP_PROP_FRAME_WIDTH) == 0:
+            return None
+        fps: float = capture.get(cv2.CAP_PROP_FPS)
+        frame_count: float = capture.get(cv2.CAP_PROP_FRAME_COUNT)
+        return Metadata(
+            filename=Path(path).name,
+            width=int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            height=int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            rotation=int(capture.get(cv2.CAP_PROP_ORIENTATION_META)) % 360,
+            duration=round(frame_count / fps * 1000) if fps else 0,
+            codec=int(capture.get(cv2.CAP_PROP_FOURCC)).to_bytes(4, "little").decode("ascii", errors="ignore").strip("\x00"),
+            fps=fps
+        )
+    finally:
+        capture.release()
 
 @contextlib.contextmanager
 def suppress_stdout():
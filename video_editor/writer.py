@@ -0,0 +1,173 @@
+from moviepy import VideoClip
+from moviepy.config import FFMPEG_BINARY
+from moviepy.tools import extensions_dict, find_extension
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+from pathlib import Path
+from queue import Queue, Full
+from threading import Thread, Event
+from typing import Optional, List
+import numpy as np
+import subprocess
+
+# Marks the end of the frame stream in the encoding queue.
+__end_of_stream: object = object()
+
+def write_video_pipelined(clip: VideoClip,
+                          output_file_path: Path,
+                          fps: Optional[float] = None,
+                          audio: bool = True,
+                          threads: Optional[int] = None,
+                          queue_size: Optional[int] = None,
+                          codec: Optional[str] = None,
+                          preset: str = "medium",
+                          ffmpeg_params: Optional[List[str]] = None,
+                          logger: Optional[str] = "bar") -> None:
+    """
+    Writes a clip to a video file, rendering and encoding frames concurrently.
+
+    Works like VideoClip.write_videofile, but the frames rendered by MoviePy (decoding and compositing)
+    are handed to a separate thread that feeds the FFmpeg encoder through a bounded queue.
+    The encoder no longer waits for the next frame to be rendered, and the queue bounds the memory used by buffered frames.
+
+    :param clip: The clip to write.
+    :param output_file_path: Path to the output video file.
+    :param fps: Frames per second for the output video. If None, the clip's fps is used.
+    :param audio: Whether to write the clip's audio.
+    :param threads: Number of threads for the FFmpeg encoder.
+    :param queue_size: Maximum number of rendered frames waiting to be encoded. If None, twice the number of threads is used.
+    :param codec: Video codec. If None, it is determined by the output file extension.
+    :param preset: Encoder preset.
+    :param ffmpeg_params: Additional FFmpeg parameters.
+    :param logger: MoviePy logger ("bar" or None).
+    :raises ValueError: If no codec is associated with the output file extension.
+    """
+    fps = clip.fps if fps is None else fps
+    extension: str = output_file_path.suffix[1:].lower()
+    if codec is None:
+        try:
+            codec = extensions_dict[extension]["codec"][0]
+        except KeyError:
+            raise ValueError(f"Unable to determine the codec for the '{extension}' file extension.")
+    if queue_size is None:
+        queue_size = 2 * (threads or 1)
+    audio_file_path: Optional[Path] = None
+    if audio and clip.audio is not None:
+        audio_codec: str = "libvorbis" if extension in ["ogv", "webm"] else "libmp3lame"
+        audio_file_path = output_file_path.with_name(
+            f"{output_file_path.stem}{VideoClip._TEMP_FILES_PREFIX}wvf_snd.{find_extension(audio_codec)}"
+        )
+        clip.audio.write_audiofile(str(audio_file_path.absolute()), codec=audio_codec, logger=logger)
+    try:
+        with FFMPEG_VideoWriter(str(output_file_path.absolute()),
+                                clip.size,
+                                fps,
+                                codec=codec,
+                                preset=preset,
+                                with_mask=clip.mask is not None,
+                                audiofile=str(audio_file_path.absolute()) if audio_file_path else None,
+                                threads=threads,
+                                ffmpeg_params=ffmpeg_params) as writer:
+            __write_frames(clip, writer, fps, queue_size, logger)
+    finally:
+        if audio_file_path is not None and audio_file_path.exists():
+            audio_file_path.unlink()
+
+def copy_video_streams(input_file_path: Path,
+                       output_file_path: Path,
+                       start_time: float = 0,
+                       end_time: Optional[float] = None,
+                       rotation: Optional[int] = None,
+                       audio: bool = True) -> bool:
+    """
+    Writes a video file by copying the encoded streams of another one with FFmpeg, without decoding or encoding frames.
+
+    Since the video stream is not re-encoded, a cut keeps the frames from the keyframe preceding start_time.
+    MP4 and MOV files hide them with an edit list, so playback starts at start_time; other containers may start earlier.
+
+    :param input_file_path: Path to the source video file.
+    :param output_file_path: Path to the output video file.
+    :param start_time: Start time in seconds.
+    :param end_time: End time in seconds. If None, copies to the end of the video.
+    :param rotation: Display rotation (counterclockwise, in degrees) stored in the output metadata.
+                     If None, the rotation of the source video is kept.
+    :param audio: Whether to copy the audio streams.
+    :return: True if the video was written, False if FFmpeg failed (e.g. the streams don't fit the output container).
+    """
+    cmd: list = [FFMPEG_BINARY, "-y", "-loglevel", "error"]
+    if start_time > 0:
+        cmd += ["-ss", "%.06f" % start_time]
+    if end_time is not None:
+        cmd += ["-t", "%.06f" % (end_time - start_time)]
+    if rotation is not None:
+        cmd += ["-display_rotation", str(rotation)]
+    cmd += ["-i", str(input_file_path.absolute()), "-c", "copy"]
+    if not audio:
+        cmd.append("-an")
+    cmd.append(str(output_file_path.absolute()))
+    if subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, stdin=subprocess.DEVNULL).returncode == 0:
+        return True
+    if output_file_path.exists():
+        output_file_path.unlink()
+    return False
+
+def __write_frames(clip: VideoClip, writer: FFMPEG_VideoWriter, fps: float, queue_size: int, logger: Optional[str]) -> None:
+    """
+    Renders the clip frames in the calling thread and encodes them in a separate thread.
+
+    :param clip: The clip to render.
+    :param writer: The FFmpeg writer receiving the frames.
+    :param fps: Frames per second at which the clip is rendered.
+    :param queue_size: Maximum number of rendered frames waiting to be encoded.
+    :param logger: MoviePy logger ("bar" or None).
+    :raises Exception: The error raised by the encoding thread, if any.
+    """
+    frames: Queue = Queue(maxsize=queue_size)
+    failed: Event = Event()
+    errors: list = []
+    encoder: Thread = Thread(target=__encode_frames, args=(writer, frames, failed, errors), daemon=True)
+    encoder.start()
+    try:
+        for t, frame in clip.iter_frames(fps=fps, with_times=True, dtype="uint8", logger=logger):
+            if clip.mask is not None:
+                mask: np.ndarray = 255 * clip.mask.get_frame(t)
+                frame = np.dstack([frame, mask.astype("uint8")])
+            if not __put(frames, frame, failed):
+                break
+    finally:
+        __put(frames, __end_of_stream, failed)
+        encoder.join()
+    if errors:
+        raise errors[0]
+
+def __encode_frames(writer: FFMPEG_VideoWriter, frames: Queue, failed: Event, errors: list) -> None:
+    """
+    Writes queued frames to the FFmpeg writer until the end of the stream.
+
+    :param writer: The FFmpeg writer receiving the frames.
+    :param frames: Queue of rendered frames.
+    :param failed: Event set if writing fails, so the rendering thread stops.
+    :param errors: List receiving the error raised while writing.
+    """
+    try:
+        while (frame := frames.get()) is not __end_of_stream:
+            writer.write_frame(frame)
+    except Exception as error:
+        errors.append(error)
+        failed.set()
+
+def __put(frames: Queue, item: object, failed: Event) -> bool:
+    """
+    Puts an item into the queue, giving up if the encoding thread has failed.
+
+    :param frames: Queue of rendered frames.
+    :param item: The frame or the end-of-stream marker.
+    :param failed: Event set if writing fails.
+    :return: True if the item was queued, False if the encoding thread has failed.
+    """
+    while not failed.is_set():
+        try:
+            frames.put(item, timeout=0.1)
+            return True
+        except Full:
+            continue
+    return False